@@ -10,4 +10,9 @@ except DistributionNotFound:
 finally:
     del get_distribution, DistributionNotFound
 
-from smecv_grid.grid import *
\ No newline at end of file
+from smecv_grid.grid import *
+from smecv_grid.ordering import sfc_index, sfc_order
+from smecv_grid.zonal import ZonalStats, gridcell_area
+from smecv_grid.bitset import GpiBitset
+from smecv_grid.diff import diff_definition_files, SubsetDiff
+from smecv_grid.chunking import CellChunkPlan, iter_cell_timeseries
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+import numpy as np
+
+class GpiBitset(object):
+    """
+    Set of gpis stored as packed bits over all gpis of the global grid
+    (for the quarter degree grid 1036800 bits, i.e. about 130 KB).
+    Allows fast membership tests, set algebra and a cheap content hash.
+
+    Parameters
+    ----------
+    bits : np.array
+        Packed bits (as from np.packbits) of the gpis in the set.
+    n : int, optional (default: 1036800)
+        Number of gpis in the global grid.
+    """
+
+    def __init__(self, bits:np.array, n=1036800):
+
+        bits = np.asarray(bits, dtype=np.uint8)
+        if bits.size != (n + 7) // 8:
+            raise ValueError("Expected {} bytes for {} gpis, got {}".format(
+                (n + 7) // 8, n, bits.size))
+
+        self.n = n
+        self.bits = bits.copy()
+        self.bits.flags.writeable = False
+
+        self._fingerprint = None
+
+    @classmethod
+    def from_gpis(cls, gpis:np.array, n=1036800):
+        """ Create bitset from the passed gpis """
+
+        gpis = np.asarray(gpis, dtype=np.int64)
+        if gpis.size and ((gpis.min() < 0) or (gpis.max() >= n)):
+            raise ValueError("gpis must be in range [0, {})".format(n))
+
+        mask = np.zeros(n, dtype=bool)
+        mask[gpis] = True
+
+        return cls(np.packbits(mask), n)
+
+    @classmethod
+    def from_grid(cls, grid, n=1036800):
+        """ Create bitset from the active gpis of a grid """
+
+        return cls.from_gpis(np.ma.getdata(grid.activegpis), n)
+
+    def to_gpis(self) -> np.array:
+        """ Sorted gpis in the set """
+
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.n))
+
+    def is_active(self, gpis) -> np.array:
+        """
+        Check whether the passed gpi(s) are in the set.
+
+        Parameters
+        ----------
+        gpis : int or np.array
+            One or multiple gpis, gpis outside of the global grid are not active.
+
+        Returns
+        -------
+        active : bool or np.array
+            True for each gpi that is in the set.
+        """
+
+        gpis = np.asarray(gpis, dtype=np.int64)
+        valid = (gpis >= 0) & (gpis < self.n)
+        safe = np.where(valid, gpis, 0)
+
+        bit = (self.bits[safe >> 3] >> (7 - (safe & 7)).astype(np.uint8)) & 1
+
+        return valid & (bit == 1)
+
+    def _check(self, other):
+        if not isinstance(other, GpiBitset):
+            raise TypeError("Expected GpiBitset, got {}".format(type(other)))
+        if other.n != self.n:
+            raise ValueError("Bitsets for different global grids ({} vs. {} gpis)".format(
+                self.n, other.n))
+        return other
+
+    def union(self, other):
+        """ Gpis that are in either set """
+        return GpiBitset(self.bits | self._check(other).bits, self.n)
+
+    def intersection(self, other):
+        """ Gpis that are in both sets """
+        return GpiBitset(self.bits & self._check(other).bits, self.n)
+
+    def difference(self, other):
+        """ Gpis that are in this set but not in the other """
+        return GpiBitset(self.bits & ~self._check(other).bits, self.n)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __len__(self):
+        return int(np.unpackbits(self.bits, count=self.n).sum())
+
+    def __contains__(self, gpi):
+        return bool(self.is_active(gpi))
+
+    @property
+    def fingerprint(self) -> str:
+        """ Hash of the set content, computed once """
+
+        if self._fingerprint is None:
+            h = hashlib.sha1(str(self.n).encode())
+            h.update(self.bits.tobytes())
+            self._fingerprint = h.hexdigest()
+
+        return self._fingerprint
+
+    def __hash__(self):
+        return int(self.fingerprint[:16], 16)
+
+    def __eq__(self, other):
+        if not isinstance(other, GpiBitset):
+            return NotImplemented
+        return (self.n == other.n) and (self.fingerprint == other.fingerprint)
+
+    def __repr__(self):
+        return "{}(n={}, fingerprint={})".format(self.__class__.__name__,
+                                                 self.n, self.fingerprint[:12])
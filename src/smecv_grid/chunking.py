@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from pygeogrids.grids import lonlat2cell
+from smecv_grid.grid import meshgrid
+
+def _segments(values:np.array, cellsize:float, offset:float) -> np.array:
+    """ Start indices of the cells along an axis, plus the axis length """
+
+    cell_ids = np.floor((values + offset) / cellsize)
+    starts = np.flatnonzero(np.diff(cell_ids)) + 1
+
+    return np.concatenate(([0], starts, [values.size]))
+
+def _pack(sizes:np.array, limit:float) -> list:
+    """ Greedily combine consecutive sizes into groups with a sum <= limit """
+
+    groups, current = [], 0
+    for size in sizes:
+        if current and (current + size > limit):
+            groups.append(current)
+            current = 0
+        current += size
+    groups.append(current)
+
+    return groups
+
+def _infer_cellsize(grid, resolution:float) -> float:
+    """
+    Find the cell size of a grid, by comparing its cells to the cells of its
+    points for all cell sizes that divide the globe into whole cells.
+    """
+
+    cellsize = getattr(grid, 'cellsize', None)
+    if cellsize is not None:
+        return cellsize
+
+    if not hasattr(grid, 'activearrcell'):
+        raise ValueError("Grid has no cells, pass the cellsize")
+
+    lons, lats = np.asarray(grid.activearrlon), np.asarray(grid.activearrlat)
+    cells = np.asarray(grid.activearrcell)
+
+    n = int(np.round(180. / resolution))
+    candidates = [5.] + [resolution * k for k in range(1, n + 1) if n % k == 0]
+    for candidate in candidates:
+        # check a few points first, most candidates fail there
+        if np.array_equal(lonlat2cell(lons[:100], lats[:100], candidate), cells[:100]) and \
+                np.array_equal(lonlat2cell(lons, lats, candidate), cells):
+            return candidate
+
+    raise ValueError("Could not find the cell size of the grid, pass the cellsize")
+
+def _split(n:int, size:int) -> tuple:
+    """ Split n into chunks of the passed size, the last one can be smaller """
+
+    return tuple([size] * (n // size) + ([n % size] if n % size else []))
+
+
+class CellChunkPlan(object):
+    """
+    Chunking of (time x lat x lon) image stacks on a SMECV grid, where the
+    spatial chunk boundaries are aligned to the cell boundaries. Each cell is
+    therefore completely contained in one spatial chunk, which allows
+    converting between image stacks and cell time series without reading
+    data multiple times.
+    Columns of the image are longitudes from west to east, rows are latitudes
+    from south to north (as for gpis in SMECV_Grid_v052) or from north to
+    south (as in the CCI SM image files) if lat_descending is set. The
+    chunks follow the row order of the images, while the index maps
+    (lats, gpi_image, cell_slices, ...) are always from south to north.
+
+    Parameters
+    ----------
+    grid : pygeogrids.CellGrid
+        Grid (e.g. SMECV_Grid_v052 or a subgrid_from_bbox) that defines the
+        image extent (all points) and the active points. Active points
+        outside of the image extent (bbox) are ignored.
+    n_time : int
+        Number of time stamps (images) in the stack.
+    chunk_bytes : int, optional (default: 2**26)
+        Target size of a chunk in bytes (64 MB by default). At least one cell
+        is always in a chunk.
+    itemsize : int, optional (default: 4)
+        Size of one value in bytes, e.g. 4 for float32
+    cellsize : float, optional (default: None)
+        Cell size in degrees, by default the cellsize of the grid is used, or
+        derived from the cells of its points (e.g. for subgrid_from_bbox).
+    resolution : float, optional (default: 0.25)
+        Grid resolution in lon/lat dimension, degrees
+    time_chunk : int, optional (default: None)
+        Number of images per chunk. By default as many images as possible are
+        used so that one cell still fits into a chunk, ideally the whole time
+        series.
+    bbox : tuple, optional (default: None)
+        min_lon, min_lat, max_lon, max_lat : Extent of the images, as passed
+        to subgrid_from_bbox. By default the extent of all grid points is used.
+    lat_descending : bool, optional (default: False)
+        Set to True if the first row of the images is the northernmost one.
+    """
+
+    def __init__(self, grid, n_time:int, chunk_bytes=2**26, itemsize=4,
+                 cellsize=None, resolution=0.25, time_chunk=None, bbox=None,
+                 lat_descending=False):
+
+        if cellsize is None:
+            cellsize = _infer_cellsize(grid, resolution)
+
+        self.cellsize = cellsize
+        self.lat_descending = lat_descending
+        self.resolution = resolution
+        self.n_time = n_time
+        self.itemsize = itemsize
+        self.chunk_bytes = chunk_bytes
+
+        if bbox is None:
+            arrlon, arrlat = np.asarray(grid.arrlon), np.asarray(grid.arrlat)
+            bbox = (arrlon.min(), arrlat.min(), arrlon.max(), arrlat.max())
+
+        lon, lat, _, _, self.shape = \
+            meshgrid(resolution, cellsize, False, (bbox[0], bbox[2]), (bbox[1], bbox[3]))
+        self.lons = lon.reshape(self.shape)[0, :]
+        self.lats = lat.reshape(self.shape)[:, 0]
+        lon0, lat0 = self.lons[0], self.lats[0]
+
+        # gpi at each pixel of the image, -1 where no point is active
+        rows = np.round((np.asarray(grid.activearrlat) - lat0) / resolution).astype(np.int64)
+        cols = np.round((np.asarray(grid.activearrlon) - lon0) / resolution).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        self.gpi_image = np.full(self.shape, -1, dtype=np.int64)
+        self.gpi_image[rows[inside], cols[inside]] = np.ma.getdata(grid.activegpis)[inside]
+
+        # index boundaries of cells along both axes
+        self.lat_bounds = _segments(self.lats, cellsize, 90.)
+        self.lon_bounds = _segments(self.lons, cellsize, 180.)
+
+        lon_grid, lat_grid = np.meshgrid(self.lons[self.lon_bounds[:-1]],
+                                         self.lats[self.lat_bounds[:-1]])
+        self.cell_image = lonlat2cell(lon_grid.flatten(), lat_grid.flatten(),
+                                      cellsize).reshape(lon_grid.shape)
+        self._cell_pos = {int(cell): (i, j) for (i, j), cell in np.ndenumerate(self.cell_image)}
+
+        lat_sizes = np.diff(self.lat_bounds)
+        lon_sizes = np.diff(self.lon_bounds)
+
+        cell_bytes = lat_sizes.max() * lon_sizes.max() * itemsize
+        if time_chunk is None:
+            time_chunk = int(min(n_time, max(1, chunk_bytes // cell_bytes)))
+        self.time_chunk = time_chunk
+
+        # pixels that fit in a chunk with the selected number of images
+        limit = max(chunk_bytes // (itemsize * time_chunk), 1)
+
+        lon_chunks = _pack(lon_sizes, limit / lat_sizes.max())
+        if len(lon_chunks) == 1:
+            # a full row of cells fits, also combine rows of cells
+            lat_chunks = _pack(lat_sizes, limit / self.shape[1])
+        else:
+            lat_chunks = lat_sizes.tolist()
+
+        # chunks from south to north, as the index maps
+        self._lat_chunks = tuple(int(c) for c in lat_chunks)
+
+        self.chunks = {'time': _split(n_time, time_chunk),
+                       'lat': self._lat_chunks[::-1] if lat_descending else self._lat_chunks,
+                       'lon': tuple(int(c) for c in lon_chunks)}
+
+    @staticmethod
+    def _slices(chunks:tuple) -> list:
+        """ Slices for the passed chunk sizes """
+
+        bounds = np.cumsum((0,) + tuple(chunks))
+        return [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    @property
+    def n_cells(self) -> int:
+        return self.cell_image.size
+
+    def cell_slices(self, cell:int) -> (slice, slice):
+        """
+        Row and column slice of a cell in the image.
+
+        Parameters
+        ----------
+        cell : int
+            Cell number
+
+        Returns
+        -------
+        lat_slice : slice
+            Rows of the cell in the image
+        lon_slice : slice
+            Columns of the cell in the image
+        """
+
+        cell = int(cell)
+        if cell not in self._cell_pos:
+            raise ValueError("Cell {} is not in the image".format(cell))
+        i, j = self._cell_pos[cell]
+
+        return (slice(int(self.lat_bounds[i]), int(self.lat_bounds[i + 1])),
+                slice(int(self.lon_bounds[j]), int(self.lon_bounds[j + 1])))
+
+    def cell_gpis(self, cell:int) -> np.array:
+        """ Active gpis in a cell, in the order they are read from the image """
+
+        lat_slice, lon_slice = self.cell_slices(cell)
+        gpis = self.gpi_image[lat_slice, lon_slice].flatten()
+
+        return gpis[gpis >= 0]
+
+    def iter_chunks(self):
+        """
+        Spatial chunks of the image.
+
+        Yields
+        ------
+        lat_slice : slice
+            Rows of the chunk, counted from south to north
+        lon_slice : slice
+            Columns of the chunk in the image
+        cells : np.array
+            Cells that are in the chunk
+        """
+
+        for lat_slice in self._slices(self._lat_chunks):
+            for lon_slice in self._slices(self.chunks['lon']):
+                i = (self.lat_bounds[:-1] >= lat_slice.start) & \
+                    (self.lat_bounds[:-1] < lat_slice.stop)
+                j = (self.lon_bounds[:-1] >= lon_slice.start) & \
+                    (self.lon_bounds[:-1] < lon_slice.stop)
+                yield lat_slice, lon_slice, self.cell_image[np.ix_(i, j)].flatten()
+
+
+def iter_cell_timeseries(stack, plan:CellChunkPlan):
+    """
+    Read an image stack chunk by chunk and return the time series of all
+    active points for each cell. Each chunk is read exactly once, so at
+    most one chunk (plan.chunk_bytes) is kept in memory.
+
+    Parameters
+    ----------
+    stack : array-like
+        Image stack with (time, lat, lon) dimensions, of the size defined in
+        the plan. Anything that supports slicing with numpy semantics can be
+        passed, e.g. a netCDF4 Variable, xarray DataArray or memmap.
+    plan : CellChunkPlan
+        Chunk plan for the stack, with the same row order (lat_descending)
+        as the images.
+
+    Yields
+    ------
+    cell : int
+        Cell number
+    gpis : np.array
+        Active gpis in the cell
+    time_slice : slice
+        Images the data was read from. Covers the whole stack if the time
+        series of a cell fits in one chunk, otherwise the same cell is
+        returned once for each time chunk.
+    data : np.array
+        Time series for the gpis in the cell as (time x gpi) array.
+    """
+
+    nrows = plan.shape[0]
+    if tuple(np.shape(stack)) != (plan.n_time,) + plan.shape:
+        raise ValueError("Stack shape {} does not match plan {}".format(
+            np.shape(stack), (plan.n_time,) + plan.shape))
+
+    for lat_slice, lon_slice, cells in plan.iter_chunks():
+        for time_slice in plan._slices(plan.chunks['time']):
+            if plan.lat_descending:
+                rows = slice(nrows - lat_slice.stop, nrows - lat_slice.start)
+                block = np.asanyarray(stack[time_slice, rows, lon_slice])[:, ::-1, :]
+            else:
+                block = np.asanyarray(stack[time_slice, lat_slice, lon_slice])
+
+            for cell in cells:
+                cell_lats, cell_lons = plan.cell_slices(cell)
+                gpis = plan.gpi_image[cell_lats, cell_lons].flatten()
+                valid = gpis >= 0
+                if not np.any(valid):
+                    continue
+                data = block[:, cell_lats.start - lat_slice.start:cell_lats.stop - lat_slice.start,
+                             cell_lons.start - lon_slice.start:cell_lons.stop - lon_slice.start]
+                data = data.reshape(data.shape[0], -1)[:, valid]
+
+                yield int(cell), gpis[valid], time_slice, data
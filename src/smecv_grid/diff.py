@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import namedtuple
+import numpy as np
+from smecv_grid.grid import load_definition_variables, meshgrid
+
+SubsetDiff = namedtuple('SubsetDiff', ['added', 'removed', 'changed'])
+SubsetDiff.__doc__ = """
+Differences of a subset variable between two definition files. Each field is
+a dict of cell -> gpis (sorted) in that cell.
+
+added : gpis that are active in the new but not in the old version
+removed : gpis that are active in the old but not in the new version
+changed : gpis that are active in both versions, but with a different value
+    (only for class variables, e.g. climate_class)
+"""
+
+MASK_FLAGS = ('land', 'rainforest', 'high_vod')
+CLASS_FLAGS = ('landcover_class', 'climate_class')
+
+def group_by_cell(gpis:np.array, cells:np.array) -> dict:
+    """
+    Group gpis by their cell.
+
+    Parameters
+    ----------
+    gpis : np.array
+        Global gpis to group
+    cells : np.array
+        Cell number for all gpis of the global grid, i.e. cells[gpi] is the
+        cell of gpi.
+
+    Returns
+    -------
+    groups : dict
+        Cell number as key and the sorted gpis in the cell as values.
+    """
+
+    gpis = np.sort(np.asarray(gpis, dtype=np.int64))
+    gpi_cells = cells[gpis]
+
+    order = np.argsort(gpi_cells, kind='stable')
+    gpis, gpi_cells = gpis[order], gpi_cells[order]
+
+    unique_cells, start = np.unique(gpi_cells, return_index=True)
+
+    return dict(zip(unique_cells.tolist(), np.split(gpis, start[1:])))
+
+def _active(flag:str, values:np.ma.masked_array, land:{np.array,None}) -> np.array:
+    """ Mask of active gpis for a variable, class variables limited to land """
+
+    active = ~np.ma.getmaskarray(values)
+
+    if flag in MASK_FLAGS:
+        active &= np.ma.getdata(values) == 1
+    elif land is not None:
+        active &= land
+
+    return active
+
+def diff_definition_files(old_version='05.2', new_version='06.2', flags=None,
+                          cellsize=5., land_only=True) -> dict:
+    """
+    Find the gpis that were added, removed or changed between the subset
+    variables of two grid definition files, e.g. to only reprocess affected
+    time series after a mask update. The files are read directly, no grids
+    are created.
+
+    Parameters
+    ----------
+    old_version : str, optional (default: '05.2')
+        Version of the definition file to compare against.
+    new_version : str, optional (default: '06.2')
+        Version of the definition file to compare.
+    flags : list, optional (default: None)
+        Subset variables to compare, e.g. ['land', 'rainforest']. By default
+        all masks (land, rainforest, high_vod) and class variables
+        (landcover_class, climate_class) in both files are compared.
+    cellsize : float, optional (default: 5.)
+        Cell size used to group the gpis.
+    land_only : bool, optional (default: True)
+        Only compare class variables at land points (of each version), class
+        values over water are not meaningful.
+
+    Returns
+    -------
+    diffs : dict
+        Subset variable name as key and the SubsetDiff as value.
+    """
+
+    requested = list(MASK_FLAGS + CLASS_FLAGS) if flags is None else list(flags)
+    names = requested + ([] if 'land' in requested else ['land'])
+
+    old = load_definition_variables(names, old_version, skip_missing=True)
+    new = load_definition_variables(names, new_version, skip_missing=True)
+
+    if flags is None:
+        flags = [f for f in requested if (f in old) and (f in new)]
+
+    # land mask is only needed to limit class variables
+    use_land = land_only and any(f not in MASK_FLAGS for f in flags)
+    required = list(flags) + (['land'] if use_land else [])
+
+    for version, variables in ((old_version, old), (new_version, new)):
+        for name in required:
+            if name not in variables:
+                raise ValueError("Variable {} not found in definition file "
+                                 "version {}".format(name, version))
+
+    _, _, gpis, cells, _ = meshgrid(resolution=0.25, cellsize=cellsize)
+    gpi_cells = np.empty(gpis.size, dtype=cells.dtype)
+    gpi_cells[gpis] = cells
+
+    if use_land:
+        old_land = np.ma.filled(old['land'] == 1, False)
+        new_land = np.ma.filled(new['land'] == 1, False)
+    else:
+        old_land, new_land = None, None
+
+    diffs = {}
+    for flag in flags:
+        old_active = _active(flag, old[flag], old_land)
+        new_active = _active(flag, new[flag], new_land)
+        old_values, new_values = np.ma.getdata(old[flag]), np.ma.getdata(new[flag])
+
+        added = np.flatnonzero(new_active & ~old_active)
+        removed = np.flatnonzero(old_active & ~new_active)
+        changed = np.flatnonzero(old_active & new_active & (old_values != new_values))
+
+        diffs[flag] = SubsetDiff(added=group_by_cell(added, gpi_cells),
+                                 removed=group_by_cell(removed, gpi_cells),
+                                 changed=group_by_cell(changed, gpi_cells))
+
+    return diffs
@@ -22,8 +22,11 @@
 # SOFTWARE.
 
 import os
+import netCDF4
 import pygeogrids.netcdf as ncgrid
 from pygeogrids.grids import BasicGrid, CellGrid, lonlat2cell
+from smecv_grid.ordering import sfc_order
+from smecv_grid.bitset import GpiBitset
 import numpy as np
 import warnings
 
@@ -35,6 +38,49 @@ def get_grid_definition_filename(version:str) -> str:
     return os.path.join(grid_info_path,
                         'ESA-CCI-SOILMOISTURE-LAND_AND_RAINFOREST_MASK-fv{}.nc'.format(version))
 
+def _read_definition_variables(ds:netCDF4.Dataset, names:list) -> dict:
+    """ Read variables from an open definition file, indexed by gpi """
+
+    gpis = np.ma.getdata(ds.variables['gpi'][:]).flatten()
+
+    variables = {}
+    for name in names:
+        data = ds.variables[name][:].flatten()
+
+        if np.issubdtype(data.dtype, np.floating):
+            data = np.ma.masked_invalid(data)
+
+        values = np.ma.masked_all(gpis.size, dtype=data.dtype)
+        values[gpis] = data
+        variables[name] = values
+
+    return variables
+
+def load_definition_variables(names:list, version='05.2', skip_missing=False) -> dict:
+    """
+    Read variables from the grid definition file of the passed version.
+    The file is opened once, see load_definition_variable. Variables that
+    are not in the file are left out if skip_missing is set, otherwise a
+    ValueError is raised.
+    """
+
+    with netCDF4.Dataset(get_grid_definition_filename(version), 'r') as ds:
+        missing = [name for name in names if name not in ds.variables]
+        if missing and not skip_missing:
+            raise ValueError("Variable(s) {} not found in definition file "
+                             "version {}".format(', '.join(missing), version))
+        return _read_definition_variables(
+            ds, [name for name in names if name not in missing])
+
+def load_definition_variable(name:str, version='05.2') -> np.ma.masked_array:
+    """
+    Read a variable from the grid definition file of the passed version.
+    The returned array is indexed by gpi, i.e. values[gpi] is the value at gpi.
+    Missing (fill or nan) values are masked.
+    """
+
+    return load_definition_variables([name], version)[name]
+
 def safe_arange(start:float, stop:float, step:float) -> np.array:
     """ Version of np.arange that can handle small step sizes """
 
@@ -210,6 +256,8 @@ class SMECV_Grid_v052(CellGrid):
 
         subset_gpis = self._load_subset(self.subset_flag, self.subset_value)
 
+        self._bitset = None
+
         super(SMECV_Grid_v052, self).__init__(lon=lon, lat=lat, gpis=gpis,
                                               cells=cells, subset=subset_gpis,
                                               shape=shape)
@@ -231,6 +279,61 @@ class SMECV_Grid_v052(CellGrid):
 
         return subset
 
+    @property
+    def bitset(self) -> GpiBitset:
+        """ Active gpis as packed bits over the global grid, created once """
+
+        if self._bitset is None:
+            self._bitset = GpiBitset.from_grid(self, n=self.gpis.size)
+        return self._bitset
+
+    @property
+    def fingerprint(self) -> str:
+        """ Hash of the active gpis, to compare subsets and use as cache key """
+
+        return self.bitset.fingerprint
+
+    def is_active(self, gpis) -> np.array:
+        """
+        Check whether the passed gpi(s) are active in the grid subset.
+
+        Parameters
+        ----------
+        gpis : int or np.array
+            One or multiple gpis of the global grid.
+
+        Returns
+        -------
+        active : bool or np.array
+            True for each passed gpi that is active.
+        """
+
+        return self.bitset.is_active(gpis)
+
+    def sfc_order(self, curve='hilbert', by_cell=False) -> (np.array, np.array):
+        """
+        Permutation of the active gpis along a space filling curve, so that
+        data can be written and iterated in locality-preserving order.
+
+        Parameters
+        ----------
+        curve : str, optional (default: 'hilbert')
+            Curve to use, either 'hilbert' or 'morton'
+        by_cell : bool, optional (default: False)
+            Keep points of the same cell together and only apply the curve
+            order within each cell.
+
+        Returns
+        -------
+        order : np.array
+            Forward permutation, self.activegpis[order] is in curve order.
+        inverse : np.array
+            Inverse permutation, curve position of each active gpi.
+        """
+
+        return sfc_order(self, curve=curve, by_cell=by_cell,
+                         resolution=self.resolution)
+
     def subgrid_from_bbox(self, min_lon, min_lat, max_lon, max_lat) -> {BasicGrid,CellGrid}:
         """
         Create a subgrid from points within the given bounding box.
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+
+def lonlat2rowcol(lon:np.array, lat:np.array, resolution=0.25) -> (np.array, np.array):
+    """ Row (from -90) and column (from -180) index of points in the global image """
+
+    row = np.floor((np.asarray(lat) + 90.) / resolution).astype(np.int64)
+    col = np.floor((np.asarray(lon) + 180.) / resolution).astype(np.int64)
+
+    return row, col
+
+def morton_index(row:np.array, col:np.array) -> np.array:
+    """
+    Position of the passed (row, col) pairs along a Morton (Z-order) curve,
+    i.e. the bits of row and col interleaved. Row and col must be < 2**16.
+    """
+
+    def spread(v):
+        v = np.asarray(v, dtype=np.uint64) & np.uint64(0xFFFF)
+        v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF)
+        v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+        v = (v | (v << np.uint64(2))) & np.uint64(0x33333333)
+        v = (v | (v << np.uint64(1))) & np.uint64(0x55555555)
+        return v
+
+    return (spread(row) << np.uint64(1)) | spread(col)
+
+def hilbert_index(row:np.array, col:np.array, order:int) -> np.array:
+    """
+    Position of the passed (row, col) pairs along a Hilbert curve that fills
+    a square of 2**order x 2**order points.
+    """
+
+    n = 2 ** order
+    x = np.array(col, dtype=np.int64, copy=True)
+    y = np.array(row, dtype=np.int64, copy=True)
+
+    if np.any((x < 0) | (x >= n) | (y < 0) | (y >= n)):
+        raise ValueError("Row/col out of range for Hilbert curve of order {}".format(order))
+
+    d = np.zeros(x.shape, dtype=np.int64)
+    s = n // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant so that the curve is continuous
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s //= 2
+
+    return d
+
+def sfc_index(lon:np.array, lat:np.array, curve='hilbert', resolution=0.25) -> np.array:
+    """
+    Position of points along a space filling curve over the global image.
+
+    Parameters
+    ----------
+    lon : np.array
+        Longitudes of the points
+    lat : np.array
+        Latitudes of the points
+    curve : str, optional (default: 'hilbert')
+        Curve to use, either 'hilbert' or 'morton'
+    resolution : float, optional (default: 0.25)
+        Grid resolution in lon/lat dimension, degrees
+
+    Returns
+    -------
+    index : np.array
+        Position along the curve for each point, to sort the points by.
+    """
+
+    row, col = lonlat2rowcol(lon, lat, resolution)
+
+    if curve == 'hilbert':
+        n = int(max(360. / resolution, 180. / resolution))
+        order = int(np.ceil(np.log2(n)))
+        return hilbert_index(row, col, order)
+    elif curve == 'morton':
+        return morton_index(row, col).astype(np.int64)
+    else:
+        raise ValueError("Unknown curve {}, use 'hilbert' or 'morton'".format(curve))
+
+def sfc_order(grid, curve='hilbert', by_cell=False, resolution=0.25) -> (np.array, np.array):
+    """
+    Permutation that brings the active points of a grid into space filling
+    curve order, which keeps points that are close in space close in memory.
+
+    Parameters
+    ----------
+    grid : pygeogrids.BasicGrid
+        Grid, the order is created for its active points.
+    curve : str, optional (default: 'hilbert')
+        Curve to use, either 'hilbert' or 'morton'
+    by_cell : bool, optional (default: False)
+        Keep points of the same cell together (cells sorted by cell number)
+        and apply the curve order only within each cell.
+    resolution : float, optional (default: 0.25)
+        Grid resolution in lon/lat dimension, degrees
+
+    Returns
+    -------
+    order : np.array
+        Forward permutation, grid.activegpis[order] are the gpis in curve order.
+    inverse : np.array
+        Inverse permutation, i.e. the curve position for each active point,
+        so that grid.activegpis[order][inverse] == grid.activegpis.
+    """
+
+    index = sfc_index(grid.activearrlon, grid.activearrlat, curve, resolution)
+
+    if by_cell:
+        order = np.lexsort((index, np.asarray(grid.activearrcell)))
+    else:
+        order = np.argsort(index, kind='stable')
+
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(order.size)
+
+    return order, inverse
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from smecv_grid.grid import load_definition_variable
+
+def gridcell_area(lat:np.array, resolution=0.25, a=6378137.,
+                  f=1./298.257223563) -> np.array:
+    """
+    Area (in m2) of grid cells with the passed center latitudes on the
+    (by default WGS84) ellipsoid.
+
+    Parameters
+    ----------
+    lat : np.array
+        Center latitudes of the grid cells
+    resolution : float, optional (default: 0.25)
+        Grid resolution in lon/lat dimension, degrees
+    a : float, optional (default: 6378137.)
+        Semi major axis of the ellipsoid
+    f : float, optional (default: 1/298.257223563)
+        Flattening of the ellipsoid
+
+    Returns
+    -------
+    area : np.array
+        Cell area for each passed latitude.
+    """
+
+    b = a * (1. - f)
+    e = np.sqrt(1. - (b / a) ** 2)
+
+    def zone(phi):
+        # area between the equator and phi, over 1 degree of longitude
+        sin_phi = np.sin(np.deg2rad(phi))
+        q = sin_phi / (1. - (e * sin_phi) ** 2) + \
+            np.log((1. + e * sin_phi) / (1. - e * sin_phi)) / (2. * e)
+        return np.pi * b ** 2 * q / 360.
+
+    lat = np.asarray(lat, dtype=np.float64)
+    upper = np.clip(lat + resolution / 2., -90., 90.)
+    lower = np.clip(lat - resolution / 2., -90., 90.)
+
+    return (zone(upper) - zone(lower)) * resolution
+
+
+class ZonalStats(object):
+    """
+    Grouped reductions of data on the SMECV grid by the classes of a variable
+    in the grid definition file (e.g. climate or landcover class).
+    The class variable is loaded once, all classes are then reduced in one
+    pass over the data.
+
+    Parameters
+    ----------
+    grid : pygeogrids.BasicGrid
+        Grid the data is stored on, the last data dimension must match
+        grid.activegpis.
+    class_flag : str, optional (default: 'climate_class')
+        Variable in the definition file that defines the classes, e.g.
+        climate_class or landcover_class
+    version : str, optional (default: '05.2')
+        Version of the definition file to read the classes from.
+    land_only : bool, optional (default: True)
+        Only assign classes to land points (of the selected version), class
+        values over water are not meaningful (e.g. in fv06.2 water is stored
+        as climate class 0).
+    """
+
+    # number of values that are processed at once, limits the memory use
+    block_size = 2 ** 22
+
+    def __init__(self, grid, class_flag='climate_class', version='05.2',
+                 land_only=True):
+
+        self.class_flag = class_flag
+        self.version = version
+        self.land_only = land_only
+
+        self.gpis = np.asarray(grid.activegpis)
+        self.lats = np.asarray(grid.activearrlat)
+
+        values = load_definition_variable(class_flag, version)[self.gpis]
+
+        valid = ~np.ma.getmaskarray(values)
+        if land_only:
+            land = load_definition_variable('land', version)[self.gpis]
+            valid &= np.ma.filled(land == 1, False)
+
+        self.classes, codes = np.unique(np.ma.getdata(values)[valid],
+                                        return_inverse=True)
+
+        # index of the class for each gpi, -1 for points without class
+        self.class_index = np.full(self.gpis.size, -1, dtype=np.int64)
+        self.class_index[valid] = codes
+
+        # columns of points with class, sorted by class, and the start of
+        # each class in them, to reduce contiguous groups
+        order = np.argsort(self.class_index, kind='stable')
+        self._columns = order[np.count_nonzero(~valid):]
+        self._bounds = np.searchsorted(self.class_index[self._columns],
+                                       np.arange(self.classes.size + 1))
+
+        self._area = None
+
+    @property
+    def area(self) -> np.array:
+        """ WGS84 area of the grid cell of each gpi """
+
+        if self._area is None:
+            self._area = gridcell_area(self.lats)
+        return self._area
+
+    def _blocks(self, data:np.array):
+        """
+        Split data into blocks of images, and yield the values of points with
+        class (sorted by class) for each block, with a mask of valid values.
+        """
+
+        data = np.atleast_2d(np.asanyarray(data))
+
+        if data.shape[-1] != self.gpis.size:
+            raise ValueError("Last data dimension ({}) must match the number "
+                             "of grid points ({})".format(data.shape[-1], self.gpis.size))
+
+        step = max(1, self.block_size // max(self._columns.size, 1))
+        for start in range(0, data.shape[0], step):
+            block = data[start:start + step][:, self._columns]
+            values = np.ma.getdata(block)
+            valid = ~np.ma.getmaskarray(block) & np.isfinite(values)
+            yield slice(start, start + step), values, valid
+
+    def _reduce(self, data:np.array, weighted=False) -> (np.array, np.array):
+        """ Sum up valid values and their number (or area) for each (time, class) """
+
+        n_time = np.atleast_2d(np.asanyarray(data)).shape[0]
+        total = np.zeros((n_time, self.classes.size))
+        norm = np.zeros((n_time, self.classes.size))
+
+        if self.classes.size == 0:
+            list(self._blocks(data)) # only check the data shape
+            return total, norm
+
+        weights = self.area[self._columns] if weighted else None
+        starts = self._bounds[:-1]
+
+        for time_slice, values, valid in self._blocks(data):
+            values = np.where(valid, values, 0)
+            if weights is None:
+                total[time_slice] = np.add.reduceat(values, starts, axis=1, dtype=np.float64)
+                norm[time_slice] = np.add.reduceat(valid, starts, axis=1, dtype=np.float64)
+            else:
+                total[time_slice] = np.add.reduceat(values * weights, starts, axis=1)
+                norm[time_slice] = np.add.reduceat(valid * weights, starts, axis=1)
+
+        return total, norm
+
+    @staticmethod
+    def _shape(result:np.array, data:np.array) -> np.array:
+        """ Drop time dimension for 1d input data """
+
+        return result[..., 0, :] if np.ndim(data) == 1 else result
+
+    def count(self, data:np.array) -> np.array:
+        """
+        Number of valid (non-nan) values per class.
+
+        Parameters
+        ----------
+        data : np.array
+            Data as (time x gpi) or (gpi) array.
+
+        Returns
+        -------
+        count : np.array
+            Counts as (time x class) or (class) array, classes as in self.classes
+        """
+
+        _, count = self._reduce(data)
+
+        return self._shape(count.astype(np.int64), data)
+
+    def sum(self, data:np.array, weighted=False) -> np.array:
+        """
+        Sum of valid values per class, optionally weighted by grid cell area.
+
+        Parameters
+        ----------
+        data : np.array
+            Data as (time x gpi) or (gpi) array.
+        weighted : bool, optional (default: False)
+            Weight values by their WGS84 grid cell area.
+
+        Returns
+        -------
+        sum : np.array
+            Sums as (time x class) or (class) array, classes as in self.classes
+        """
+
+        total, _ = self._reduce(data, weighted)
+
+        return self._shape(total, data)
+
+    def mean(self, data:np.array, weighted=False) -> np.array:
+        """
+        Mean of valid values per class, optionally weighted by grid cell area.
+        Classes without valid values are nan.
+
+        Parameters
+        ----------
+        data : np.array
+            Data as (time x gpi) or (gpi) array.
+        weighted : bool, optional (default: False)
+            Weight values by their WGS84 grid cell area.
+
+        Returns
+        -------
+        mean : np.array
+            Means as (time x class) or (class) array, classes as in self.classes
+        """
+
+        total, norm = self._reduce(data, weighted)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / norm
+
+        return self._shape(mean, data)
+
+    def percentile(self, data:np.array, q) -> np.array:
+        """
+        Percentiles of valid values per class.
+
+        Parameters
+        ----------
+        data : np.array
+            Data as (time x gpi) or (gpi) array.
+        q : float or list
+            Percentile(s) to compute, between 0 and 100.
+
+        Returns
+        -------
+        percentile : np.array
+            Percentiles as (time x class) or (class) array, classes as in
+            self.classes. If multiple q are passed, the first dimension is q.
+        """
+
+        q = np.asarray(q, dtype=np.float64)
+        n_time = np.atleast_2d(np.asanyarray(data)).shape[0]
+        result = np.full(q.shape + (n_time, self.classes.size), np.nan)
+
+        for time_slice, values, valid in self._blocks(data):
+            values = np.where(valid, values, np.nan)
+            for i in range(self.classes.size):
+                group = values[:, self._bounds[i]:self._bounds[i + 1]]
+                has_data = np.any(valid[:, self._bounds[i]:self._bounds[i + 1]], axis=1)
+                if np.any(has_data):
+                    rows = np.arange(n_time)[time_slice][has_data]
+                    result[..., rows, i] = np.nanpercentile(group[has_data], q, axis=1)
+
+        return self._shape(result, data)
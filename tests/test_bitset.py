@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from smecv_grid import SMECV_Grid_v042, SMECV_Grid_v052
+from smecv_grid.bitset import GpiBitset
+import pytest
+
+def test_bitset_roundtrip():
+    gpis = np.array([0, 7, 8, 739040, 1036799])
+    bs = GpiBitset.from_gpis(gpis)
+    assert bs.bits.nbytes == 129600
+    assert len(bs) == 5
+    np.testing.assert_equal(bs.to_gpis(), gpis)
+    np.testing.assert_equal(bs.is_active([0, 1, 8, 1036799, -1, 1036800]),
+                            [True, False, True, True, False, False])
+    assert 739040 in bs
+    assert 739041 not in bs
+    with pytest.raises(ValueError):
+        GpiBitset.from_gpis([1036800])
+
+def test_bitset_algebra():
+    a = GpiBitset.from_gpis([1, 2, 3, 100])
+    b = GpiBitset.from_gpis([3, 4, 100, 5000])
+    np.testing.assert_equal((a | b).to_gpis(), [1, 2, 3, 4, 100, 5000])
+    np.testing.assert_equal((a & b).to_gpis(), [3, 100])
+    np.testing.assert_equal((a - b).to_gpis(), [1, 2])
+    np.testing.assert_equal(b.difference(a).to_gpis(), [4, 5000])
+    with pytest.raises(ValueError):
+        a | GpiBitset.from_gpis([1], n=10)
+
+def test_bitset_fingerprint():
+    a = GpiBitset.from_gpis([1, 2, 3])
+    b = GpiBitset.from_gpis([3, 2, 1])
+    c = GpiBitset.from_gpis([1, 2])
+    assert a == b
+    assert a != c
+    assert hash(a) == hash(b)
+    assert len({a, b, c}) == 2
+
+def test_grid_is_active():
+    grid = SMECV_Grid_v052('rainforest')
+    assert grid.is_active(516349)
+    active = grid.is_active(grid.gpis)
+    assert active.sum() == grid.activegpis.size == 14851
+    np.testing.assert_equal(np.flatnonzero(active), np.sort(grid.activegpis))
+
+def test_grid_fingerprint():
+    land, rainforest = SMECV_Grid_v052('land'), SMECV_Grid_v052('rainforest')
+    assert land.fingerprint == SMECV_Grid_v052('land').fingerprint
+    assert land.fingerprint != rainforest.fingerprint
+    outside = np.setdiff1d(rainforest.activegpis, land.activegpis)
+    np.testing.assert_equal((rainforest.bitset - land.bitset).to_gpis(), outside)
+    assert len(land.bitset & rainforest.bitset) == 14851 - outside.size
+    # gpis refer to the same locations in v4 and v5
+    assert GpiBitset.from_grid(SMECV_Grid_v042('land')) == land.bitset
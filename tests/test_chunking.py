@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from smecv_grid import SMECV_Grid_v052
+from smecv_grid.chunking import CellChunkPlan, iter_cell_timeseries
+from pygeogrids.grids import BasicGrid
+import pytest
+
+def test_plan_global():
+    grid = SMECV_Grid_v052(None)
+    plan = CellChunkPlan(grid, n_time=365, chunk_bytes=2**24, itemsize=4)
+    assert plan.shape == (720, 1440)
+    assert plan.n_cells == 2592
+    assert plan.time_chunk == 365 # one cell over all images is 584 KB
+    assert sum(plan.chunks['time']) == 365
+    assert sum(plan.chunks['lat']) == 720
+    assert sum(plan.chunks['lon']) == 1440
+    # all chunk boundaries are cell boundaries
+    assert all(np.cumsum(plan.chunks['lat']) % 20 == 0)
+    assert all(np.cumsum(plan.chunks['lon']) % 20 == 0)
+    for lat_size in plan.chunks['lat']:
+        for lon_size in plan.chunks['lon']:
+            assert lat_size * lon_size * 365 * 4 <= 2**24
+    assert plan.cell_slices(601) == (slice(500, 520), slice(320, 340))
+    assert 739040 in plan.cell_gpis(601)
+    assert plan.cell_gpis(601).size == 400
+
+def test_plan_small_chunks():
+    grid = SMECV_Grid_v052(None)
+    plan = CellChunkPlan(grid, n_time=10000, chunk_bytes=2**20, itemsize=8)
+    assert plan.time_chunk == 327 # 1 MB / (400 * 8 B)
+    assert plan.chunks['lat'] == (20,) * 36
+    assert plan.chunks['lon'] == (20,) * 72
+
+def test_plan_bbox_cellsize():
+    grid = SMECV_Grid_v052('land').subgrid_from_bbox(-11, 34, 43, 71)
+    plan = CellChunkPlan(grid, n_time=10, cellsize=10., chunk_bytes=2**30)
+    assert plan.shape == (148, 214) # no land points in the outermost columns
+    plan = CellChunkPlan(grid, n_time=10, cellsize=10., chunk_bytes=2**30,
+                         bbox=(-11, 34, 43, 71))
+    assert plan.shape == (148, 216)
+    assert plan.chunks['lat'] == (148,)
+    assert plan.chunks['lon'] == (216,)
+    # first cell starts at -11 and ends at -10 deg lon
+    assert plan.lon_bounds[1] == 4
+    gpis = np.concatenate([plan.cell_gpis(c) for c in plan.cell_image.flatten()])
+    np.testing.assert_equal(np.sort(gpis), np.sort(grid.activegpis))
+
+@pytest.mark.parametrize("lat_descending", [False, True])
+@pytest.mark.parametrize("chunk_bytes", [2**12, 2**30])
+def test_iter_cell_timeseries(lat_descending, chunk_bytes):
+    bbox = (-11, 34, 43, 71)
+    grid = SMECV_Grid_v052('land').subgrid_from_bbox(*bbox)
+    glob = SMECV_Grid_v052(None).subgrid_from_bbox(*bbox)
+    plan = CellChunkPlan(grid, n_time=6, chunk_bytes=chunk_bytes, bbox=bbox,
+                         lat_descending=lat_descending)
+
+    # value encodes time and gpi
+    stack = np.arange(6)[:, None, None] * 10**7 + glob.activegpis.reshape(plan.shape)[None]
+    if lat_descending:
+        stack = stack[:, ::-1, :]
+
+    series, read = {}, []
+    for cell, gpis, time_slice, data in iter_cell_timeseries(stack, plan):
+        assert data.shape == (time_slice.stop - time_slice.start, gpis.size)
+        assert np.all(data % 10**7 == gpis)
+        assert np.all(data // 10**7 == np.arange(6)[time_slice, None])
+        series.setdefault(cell, []).append(time_slice)
+        if time_slice.start == 0:
+            read.append(gpis)
+
+    np.testing.assert_equal(np.sort(np.concatenate(read)), np.sort(grid.activegpis))
+    if chunk_bytes == 2**12:
+        assert all(len(s) == 3 for s in series.values()) # 2 images per chunk
+    else:
+        assert all(s == [slice(0, 6)] for s in series.values())
+
+def test_iter_cell_timeseries_shape():
+    plan = CellChunkPlan(SMECV_Grid_v052(None), n_time=2)
+    with pytest.raises(ValueError):
+        next(iter_cell_timeseries(np.zeros((3, 720, 1440)), plan))
+
+def test_plan_bbox_smaller_than_grid():
+    bbox = (-11, 34, 43, 71)
+    grid = SMECV_Grid_v052('land')
+    box_gpis = np.sort(grid.subgrid_from_bbox(*bbox).activegpis)
+    plan = CellChunkPlan(grid, n_time=10, bbox=bbox)
+    assert plan.shape == (148, 216)
+    np.testing.assert_equal(np.sort(plan.gpi_image[plan.gpi_image >= 0]), box_gpis)
+
+    # same result if the active points are not sorted
+    order, _ = grid.sfc_order()
+    shuffled = grid.subgrid_from_gpis(grid.activegpis[order])
+    plan_shuffled = CellChunkPlan(shuffled, n_time=10, bbox=bbox)
+    np.testing.assert_equal(plan_shuffled.gpi_image, plan.gpi_image)
+
+    glob = SMECV_Grid_v052(None).subgrid_from_bbox(*bbox)
+    stack = np.broadcast_to(glob.activegpis.reshape(plan.shape), (10,) + plan.shape)
+    for cell, gpis, _, data in iter_cell_timeseries(stack, plan_shuffled):
+        assert np.all(data == gpis)
+
+def test_cell_slices_unknown():
+    plan = CellChunkPlan(SMECV_Grid_v052(None).subgrid_from_bbox(-11, 34, 43, 71), n_time=1)
+    with pytest.raises(ValueError):
+        plan.cell_slices(0)
+
+def test_plan_subgrid_cellsize():
+    grid = SMECV_Grid_v052('land', cellsize=10.).subgrid_from_bbox(-11, 34, 43, 71)
+    plan = CellChunkPlan(grid, n_time=10, bbox=(-11, 34, 43, 71))
+    assert plan.cellsize == 10.
+    assert set(np.unique(grid.activearrcell)) <= set(plan.cell_image.flatten())
+    for cell, gpis, _, _ in iter_cell_timeseries(np.zeros((10,) + plan.shape), plan):
+        assert np.all(grid.gpi2cell(gpis) == cell)
+
+def test_plan_without_cells():
+    grid = SMECV_Grid_v052(None).to_cell_grid(5.)
+    assert CellChunkPlan(grid, n_time=1).cellsize == 5.
+    basic = BasicGrid(grid.activearrlon[:10], grid.activearrlat[:10])
+    with pytest.raises(ValueError):
+        CellChunkPlan(basic, n_time=1)
+    assert CellChunkPlan(basic, n_time=1, cellsize=2.5).cellsize == 2.5
+
+def test_plan_lat_descending_chunks():
+    bbox = (-11, 34, 43, 68)
+    grid = SMECV_Grid_v052(None).subgrid_from_bbox(*bbox)
+    plan = CellChunkPlan(grid, n_time=365, chunk_bytes=2**20, bbox=bbox,
+                         lat_descending=True)
+    south_first = CellChunkPlan(grid, n_time=365, chunk_bytes=2**20, bbox=bbox)
+    assert plan.chunks['lat'] == south_first.chunks['lat'][::-1]
+    assert plan.chunks['lat'][0] == 12 and plan.chunks['lat'][-1] == 4
+
+    # lats of the rows of a north first stack, every chunk boundary is a cell boundary
+    lats = plan.lats[::-1]
+    cell_rows = np.floor((lats + 90.) / plan.cellsize)
+    cell_bounds = np.flatnonzero(np.diff(cell_rows)) + 1
+    chunk_bounds = np.cumsum(plan.chunks['lat'])[:-1]
+    assert set(chunk_bounds) <= set(cell_bounds)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from smecv_grid import SMECV_Grid_v052
+from smecv_grid.grid import load_definition_variable, load_definition_variables, meshgrid
+from smecv_grid.diff import diff_definition_files, group_by_cell
+import pytest
+
+def test_group_by_cell():
+    _, _, gpis, cells, _ = meshgrid(cellsize=5.)
+    groups = group_by_cell([739040, 516349, 739041, 0], cells)
+    assert list(groups.keys()) == [0, 601, 1493]
+    np.testing.assert_equal(groups[601], [739040, 739041])
+    np.testing.assert_equal(groups[1493], [516349])
+    assert group_by_cell([], cells) == {}
+
+def test_diff_same_version():
+    diffs = diff_definition_files('05.2', '05.2')
+    assert sorted(diffs.keys()) == sorted(['land', 'rainforest', 'high_vod',
+                                           'landcover_class', 'climate_class'])
+    for diff in diffs.values():
+        assert diff.added == diff.removed == diff.changed == {}
+
+def test_diff_v4_v5():
+    diffs = diff_definition_files('04.2', '05.2')
+    assert sorted(diffs.keys()) == ['land', 'rainforest'] # only masks in v4
+
+def test_diff_v5_v6():
+    diffs = diff_definition_files('05.2', '06.2', cellsize=5.)
+    for flag in ['land', 'rainforest', 'high_vod', 'landcover_class']:
+        assert diffs[flag].added == diffs[flag].removed == diffs[flag].changed == {}
+
+    added = diffs['climate_class'].added
+    gpis = np.concatenate(list(added.values()))
+    assert gpis.size == 3465
+    grid = SMECV_Grid_v052(None)
+    for cell, cell_gpis in added.items():
+        assert np.all(grid.gpi2cell(cell_gpis) == cell)
+    # points without climate class in v5 that got one in v6
+    assert np.all(load_definition_variable('climate_class', '05.2').mask[gpis])
+    assert not np.any(load_definition_variable('climate_class', '06.2').mask[gpis])
+    assert np.all(load_definition_variable('land', '06.2')[gpis] == 1)
+
+def test_diff_flags_land_only():
+    diffs = diff_definition_files('05.2', '06.2', flags=['climate_class'], land_only=False)
+    assert list(diffs.keys()) == ['climate_class']
+    # without land mask, water (stored as class 0 in v6) is reported as added
+    added = np.concatenate(list(diffs['climate_class'].added.values()))
+    assert added.size > 600000
+
+def test_diff_missing_flag():
+    with pytest.raises(ValueError, match='high_vod.*04.2'):
+        diff_definition_files('04.2', '05.2', flags=['high_vod'])
+    with pytest.raises(ValueError, match='climate_class.*04.2'):
+        diff_definition_files('05.2', '04.2', flags=['land', 'climate_class'])
+    assert diff_definition_files('04.2', '05.2', flags=['rainforest'])['rainforest'].added == {}
+
+def test_load_definition_variables_missing():
+    with pytest.raises(ValueError, match='high_vod'):
+        load_definition_variables(['land', 'high_vod'], '04.2')
+    variables = load_definition_variables(['land', 'high_vod'], '04.2', skip_missing=True)
+    assert list(variables.keys()) == ['land']
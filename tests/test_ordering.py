@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from smecv_grid import SMECV_Grid_v052
+from smecv_grid.ordering import hilbert_index, morton_index, sfc_order
+import pytest
+
+def test_hilbert_index_adjacent():
+    order = 3
+    n = 2 ** order
+    row, col = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    d = hilbert_index(row.flatten(), col.flatten(), order)
+    assert np.array_equal(np.sort(d), np.arange(n * n))
+    # consecutive curve positions are always direct neighbours
+    pos = np.argsort(d)
+    steps = np.abs(np.diff(row.flatten()[pos])) + np.abs(np.diff(col.flatten()[pos]))
+    assert np.all(steps == 1)
+
+def test_morton_index():
+    assert morton_index(0, 1) == 1
+    assert morton_index(1, 0) == 2
+    assert morton_index(1, 1) == 3
+    assert morton_index(2, 0) == 8
+    assert morton_index(1439, 719) > morton_index(719, 1439) > 0
+
+@pytest.mark.parametrize("curve", ['hilbert', 'morton'])
+@pytest.mark.parametrize("by_cell", [False, True])
+def test_sfc_order(curve, by_cell):
+    grid = SMECV_Grid_v052('land')
+    order, inverse = grid.sfc_order(curve=curve, by_cell=by_cell)
+    assert order.size == inverse.size == grid.activegpis.size
+    assert np.array_equal(np.sort(order), np.arange(order.size))
+    assert np.array_equal(grid.activegpis[order][inverse], grid.activegpis)
+    if by_cell:
+        assert np.all(np.diff(grid.activearrcell[order]) >= 0)
+
+def test_sfc_order_locality():
+    grid = SMECV_Grid_v052(None).subgrid_from_bbox(-11, 34, 43, 71)
+    order, _ = sfc_order(grid, 'hilbert')
+    lons, lats = grid.activearrlon[order], grid.activearrlat[order]
+    dist = np.hypot(np.diff(lons), np.diff(lats))
+    rowmajor_dist = np.hypot(np.diff(grid.activearrlon), np.diff(grid.activearrlat))
+    assert np.median(dist) == 0.25
+    assert np.mean(dist) < np.mean(rowmajor_dist)
+
+def test_sfc_order_unknown_curve():
+    with pytest.raises(ValueError):
+        SMECV_Grid_v052('rainforest').sfc_order(curve='peano')
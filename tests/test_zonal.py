@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# The MIT License (MIT)
+#
+# Copyright (c) 2020, TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from smecv_grid import SMECV_Grid_v052
+from smecv_grid.zonal import ZonalStats, gridcell_area
+import pytest
+
+def test_gridcell_area():
+    grid = SMECV_Grid_v052(None)
+    area = gridcell_area(grid.activearrlat)
+    np.testing.assert_allclose(area.sum(), 5.10065e14, rtol=1e-5) # WGS84 surface
+    assert area[0] < area[720 * 1440 // 2]
+
+@pytest.fixture(scope='module')
+def zs():
+    return ZonalStats(SMECV_Grid_v052('land'), class_flag='climate_class')
+
+def test_zonal_count(zs):
+    assert zs.classes.size == 29 # one climate class has no land points
+    assert zs.classes[0] == 0.
+    data = np.ones(zs.gpis.size)
+    count = zs.count(data)
+    assert count.shape == (29,)
+    # same as loading a separate grid for the class
+    af = SMECV_Grid_v052('climate_class', 0.).activegpis
+    assert count[0] == np.intersect1d(af, zs.gpis).size
+    tropical = SMECV_Grid_v052('climate_class', [0., 1., 2.]).activegpis
+    assert count[:3].sum() == np.intersect1d(tropical, zs.gpis).size
+
+def test_zonal_mean(zs):
+    rng = np.random.RandomState(42)
+    data = rng.rand(3, zs.gpis.size)
+    data[0, :100] = np.nan
+    mean, count = zs.mean(data), zs.count(data)
+    assert mean.shape == count.shape == (3, 29)
+    for t in range(3):
+        for k in [0, 13, 28]:
+            vals = data[t, zs.class_index == k]
+            assert count[t, k] == np.isfinite(vals).sum()
+            np.testing.assert_allclose(mean[t, k], np.nanmean(vals))
+    # constant field has the same weighted mean
+    np.testing.assert_allclose(zs.mean(np.full(zs.gpis.size, 2.), weighted=True), 2.)
+
+def test_zonal_weighted_mean(zs):
+    data = zs.lats.copy()
+    k = 14
+    sel = zs.class_index == k
+    w = gridcell_area(zs.lats[sel])
+    np.testing.assert_allclose(zs.mean(data, weighted=True)[k],
+                               np.sum(data[sel] * w) / np.sum(w))
+    np.testing.assert_allclose(zs.sum(data)[k], np.sum(data[sel]))
+
+def test_zonal_percentile(zs):
+    rng = np.random.RandomState(1)
+    data = rng.rand(2, zs.gpis.size)
+    p = zs.percentile(data, [10, 50])
+    assert p.shape == (2, 2, 29)
+    vals = data[1, zs.class_index == 3]
+    np.testing.assert_allclose(p[:, 1, 3], np.percentile(vals, [10, 50]))
+    np.testing.assert_allclose(zs.percentile(data[0], 50)[3],
+                               np.median(data[0, zs.class_index == 3]))
+
+def test_zonal_wrong_shape(zs):
+    with pytest.raises(ValueError):
+        zs.mean(np.ones(10))
+
+def test_zonal_blocks(zs):
+    rng = np.random.RandomState(3)
+    data = rng.rand(7, zs.gpis.size).astype(np.float32)
+    data[2, ::5] = np.nan
+    expected_mean, expected_p = zs.mean(data, weighted=True), zs.percentile(data, 50)
+    blocked = ZonalStats(SMECV_Grid_v052('land'), class_flag='climate_class')
+    blocked.block_size = 2 * zs.gpis.size # 2 images per block
+    np.testing.assert_allclose(blocked.mean(data, weighted=True), expected_mean)
+    np.testing.assert_allclose(blocked.percentile(data, 50), expected_p)
+    np.testing.assert_equal(blocked.count(data), zs.count(data))
+
+def test_zonal_masked_int(zs):
+    data = np.ma.masked_array(np.full((2, zs.gpis.size), 3, dtype=np.int16))
+    data[1, zs.class_index == 0] = np.ma.masked
+    count = zs.count(data)
+    assert count[1, 0] == 0
+    np.testing.assert_equal(count[0], zs.count(np.ones(zs.gpis.size)))
+    np.testing.assert_allclose(zs.mean(data)[0], 3.)
+    assert np.isnan(zs.mean(data)[1, 0])
+
+def test_zonal_v6_land_only():
+    grid = SMECV_Grid_v052(None)
+    land = SMECV_Grid_v052('land').activegpis
+    zs = ZonalStats(grid, class_flag='climate_class', version='06.2')
+    count = zs.count(np.ones(grid.activegpis.size))
+    # water is stored as class 0 in v6, but not counted
+    assert count.sum() <= land.size
+    assert np.all(np.isin(zs.gpis[zs.class_index >= 0], land))
+    zs_all = ZonalStats(grid, class_flag='climate_class', version='06.2', land_only=False)
+    assert zs_all.count(np.ones(grid.activegpis.size))[0] > 700000